@@ -3,7 +3,7 @@ import json
 import argparse
 import csv
 from datetime import datetime, timedelta, timezone
-from dateutil.parser import isoparse
+from ValidazioneSegmenti import validate_segments, summarize_quality, save_quality_csv
 
 def load_json(file_path):
     with open(file_path, 'r', encoding='utf-8') as f:
@@ -21,7 +21,6 @@ def init_empty_day_dict():
 
 def analyze_file_per_day(file_path, start_date, end_date):
     data = load_json(file_path)
-    daily_stats = {}
 
     if isinstance(data, dict) and "semanticSegments" in data:
         entries = data["semanticSegments"]
@@ -30,33 +29,18 @@ def analyze_file_per_day(file_path, start_date, end_date):
     else:
         raise ValueError("Formato JSON non riconosciuto.")
 
-    for entry in entries:
-        try:
-            if isinstance(entry, dict) and 'startTime' in entry:
-                start_time = isoparse(entry['startTime'])
-            else:
-                continue
-        except Exception:
-            continue
-
-        if not (start_date <= start_time <= end_date):
-            continue
+    raw_signals = data.get("rawSignals") if isinstance(data, dict) else None
+    segments = validate_segments(entries, start_date, end_date, raw_signals)
 
-        activity = entry.get("activity")
-        if not activity or "topCandidate" not in activity:
-            continue
-
-        activity_type = activity["topCandidate"]["type"].lower().replace("_", " ")
-        distance_km = float(activity.get("distanceMeters", 0)) / 1000
-
-        day = start_time.date().isoformat()
-        if day not in daily_stats:
-            daily_stats[day] = init_empty_day_dict()
+    days = segments["local_start"].dt.strftime("%Y-%m-%d")
+    daily_stats = {day: init_empty_day_dict() for day in days.unique()}
 
+    totals = segments.groupby([days, "activity_type"])["distance_km"].sum()
+    for (day, activity_type), distance_km in totals.items():
         if activity_type in daily_stats[day]:
             daily_stats[day][activity_type] += distance_km
 
-    return daily_stats
+    return daily_stats, summarize_quality(segments)
 
 def save_combined_csv(all_data, output_path):
     with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
@@ -71,12 +55,14 @@ def main():
     parser = argparse.ArgumentParser(description="Calcola statistiche giornaliere di mobilità e le salva in un unico CSV.")
     parser.add_argument("--uploads", default="uploads", help="Cartella contenente i file degli utenti.")
     parser.add_argument("--output", default="mobilita.csv", help="Percorso file CSV in output.")
+    parser.add_argument("--quality-output", default="qualita_segmenti.csv", help="Percorso file CSV con il report di qualità dei segmenti per utente.")
     args = parser.parse_args()
 
     start_date = datetime(2025, 4, 1, tzinfo=timezone.utc)
     end_date = datetime.now(timezone.utc)
 
     all_results = []
+    quality_rows = []
 
     for user_id in os.listdir(args.uploads):
         user_folder = os.path.join(args.uploads, user_id)
@@ -95,7 +81,7 @@ def main():
             continue
 
         try:
-            daily_stats = analyze_file_per_day(file_path, start_date, end_date)
+            daily_stats, quality = analyze_file_per_day(file_path, start_date, end_date)
             for date_str in sorted(daily_stats.keys()):
                 d = daily_stats[date_str]
                 total = sum(d.values())
@@ -111,6 +97,7 @@ def main():
                     "percent_sustainable": round(percent, 2)
                 })
 
+            quality_rows.append({"user_id": user_id, **quality})
             print(f"✅ Elaborato user {user_id} ({len(daily_stats)} giorni)")
         except Exception as e:
             print(f"❌ Errore con user {user_id}: {e}")
@@ -118,5 +105,8 @@ def main():
     save_combined_csv(all_results, args.output)
     print(f"\n📁 File salvato: {args.output} ({len(all_results)} righe)")
 
+    save_quality_csv(quality_rows, args.quality_output)
+    print(f"📁 Report qualità salvato: {args.quality_output} ({len(quality_rows)} utenti)")
+
 if __name__ == "__main__":
     main()
@@ -3,7 +3,7 @@ import json
 import argparse
 import csv
 from datetime import datetime, timedelta, timezone
-from dateutil.parser import isoparse
+from ValidazioneSegmenti import validate_segments, summarize_quality, save_quality_csv
 
 def load_json(file_path):
     print(f"Loading JSON file: {file_path}")
@@ -30,7 +30,6 @@ def get_week_range(date_obj):
 
 def analyze_file_per_week(file_path, start_date, end_date):
     data = load_json(file_path)
-    weekly_stats = {}
 
     if isinstance(data, dict) and "semanticSegments" in data:
         entries = data["semanticSegments"]
@@ -39,37 +38,28 @@ def analyze_file_per_week(file_path, start_date, end_date):
     else:
         raise ValueError("Formato JSON non riconosciuto.")
 
-    for entry in entries:
-        try:
-            if isinstance(entry, dict) and 'startTime' in entry:
-                start_time = isoparse(entry['startTime'])
-            else:
-                continue
-        except Exception:
-            continue
+    raw_signals = data.get("rawSignals") if isinstance(data, dict) else None
+    segments = validate_segments(entries, start_date, end_date, raw_signals)
 
-        if not (start_date <= start_time <= end_date):
-            continue
+    dates = segments["local_start"].dt.normalize()
+    week_of = {date_obj: get_week_key(date_obj) for date_obj in dates.unique()}
+    week_keys = dates.map(week_of)
 
-        activity = entry.get("activity")
-        if not activity or "topCandidate" not in activity:
-            continue
-
-        activity_type = activity["topCandidate"]["type"].lower().replace("_", " ")
-        distance_km = float(activity.get("distanceMeters", 0)) / 1000
-
-        week_key = get_week_key(start_time)
+    weekly_stats = {}
+    for date_obj, week_key in week_of.items():
         if week_key not in weekly_stats:
             weekly_stats[week_key] = {
-                "start": get_week_range(start_time)[0],
-                "end": get_week_range(start_time)[1],
+                "start": get_week_range(date_obj)[0],
+                "end": get_week_range(date_obj)[1],
                 "data": init_empty_week_dict()
             }
 
+    totals = segments.groupby([week_keys, "activity_type"])["distance_km"].sum()
+    for (week_key, activity_type), distance_km in totals.items():
         if activity_type in weekly_stats[week_key]["data"]:
             weekly_stats[week_key]["data"][activity_type] += distance_km
 
-    return weekly_stats
+    return weekly_stats, summarize_quality(segments)
 
 def save_combined_weekly_csv(all_data, output_path):
     with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
@@ -84,6 +74,7 @@ def main():
     parser = argparse.ArgumentParser(description="Calcola statistiche settimanali di mobilità in un unico CSV.")
     parser.add_argument("--uploads", default="uploads", help="Cartella contenente i file degli utenti.")
     parser.add_argument("--output", default="mobilita_settimanale.csv", help="Percorso file CSV di output.")
+    parser.add_argument("--quality-output", default="qualita_segmenti_settimanale.csv", help="Percorso file CSV con il report di qualità dei segmenti per utente.")
     args = parser.parse_args()
 
     print(f"Using uploads directory: {args.uploads}")
@@ -94,6 +85,7 @@ def main():
     print(f"Analyzing data from {start_date} to {end_date}")
 
     all_results = []
+    quality_rows = []
 
     user_dirs = os.listdir(args.uploads)
     print(f"Found {len(user_dirs)} user directories")
@@ -119,7 +111,7 @@ def main():
 
         try:
             print(f"Analyzing file: {file_path}")
-            weekly_stats = analyze_file_per_week(file_path, start_date, end_date)
+            weekly_stats, quality = analyze_file_per_week(file_path, start_date, end_date)
             print(f"Found {len(weekly_stats)} weeks of data")
             
             for week_key in sorted(weekly_stats.keys()):
@@ -140,6 +132,7 @@ def main():
                     "percent_sustainable": round(percent, 2)
                 })
 
+            quality_rows.append({"user_id": user_id, **quality})
             print(f"✅ Elaborato user {user_id} ({len(weekly_stats)} settimane)")
         except Exception as e:
             print(f"❌ Errore con user {user_id}: {str(e)}")
@@ -150,5 +143,8 @@ def main():
     save_combined_weekly_csv(all_results, args.output)
     print(f"\n📁 File settimanale salvato: {args.output} ({len(all_results)} righe)")
 
+    save_quality_csv(quality_rows, args.quality_output)
+    print(f"📁 Report qualità salvato: {args.quality_output} ({len(quality_rows)} utenti)")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,205 @@
+import csv
+import numpy as np
+import pandas as pd
+
+# Velocità media massima plausibile (km/h) per ciascuna modalità. Le medie includono le soste,
+# quindi non c'è un minimo: un segmento lento non è di per sé sospetto.
+MAX_SPEED_KMH = {
+    "walking": 10,
+    "running": 20,
+    "cycling": 45,
+    "in bus": 100,
+    "in train": 320,
+    "in passenger vehicle": 200,
+}
+
+# Tipi dei probableActivities (rawSignals) che corrispondono in modo univoco a una modalità.
+# ON_FOOT, IN_VEHICLE e IN_ROAD_VEHICLE sono classi aggregate e vengono ignorate.
+CANDIDATE_ALIASES = {
+    "on bicycle": "cycling",
+    "in rail vehicle": "in train",
+}
+
+QUALITY_FIELDNAMES = ["user_id", "segments", "ok", "reassigned", "flagged", "unverified", "km_total", "km_reassigned", "km_flagged", "km_unverified", "percent_flagged"]
+
+
+def normalize_type(activity_type):
+    return str(activity_type).lower().replace("_", " ")
+
+
+def _parse_times(values):
+    return pd.to_datetime(pd.Series(values, dtype=object), utc=True, format="ISO8601", errors="coerce")
+
+
+def _candidate_records(raw_signals):
+    """
+    Appiattisce gli activityRecord dei rawSignals in array ordinati per timestamp.
+    """
+    timestamps, modes, confidences = [], [], []
+    for signal in raw_signals or []:
+        record = signal.get("activityRecord") if isinstance(signal, dict) else None
+        if not record or "timestamp" not in record:
+            continue
+        for candidate in record.get("probableActivities", []):
+            mode = normalize_type(candidate.get("type", ""))
+            mode = CANDIDATE_ALIASES.get(mode, mode)
+            if mode in MAX_SPEED_KMH:
+                timestamps.append(record["timestamp"])
+                modes.append(mode)
+                confidences.append(float(candidate.get("confidence", 0)))
+
+    records = pd.DataFrame({"ts": _parse_times(timestamps), "mode": modes, "confidence": confidences})
+    records = records.dropna(subset=["ts"]).sort_values("ts", kind="stable")
+    return records["ts"].to_numpy(dtype="int64"), records["mode"].to_numpy(dtype=object), records["confidence"].to_numpy()
+
+
+def _reassign(start_ns, end_ns, speed, original, suspect, raw_signals):
+    """
+    Per ogni segmento sospetto somma le confidenze dei candidati registrati nel suo intervallo
+    e restituisce la modalità plausibile più probabile (None se nessuna).
+    """
+    result = np.full(len(suspect), None, dtype=object)
+    if not raw_signals or not suspect.any():
+        return result
+    rec_ts, rec_mode, rec_conf = _candidate_records(raw_signals)
+    if len(rec_ts) == 0:
+        return result
+
+    seg_idx = np.flatnonzero(suspect)
+    lo = np.searchsorted(rec_ts, start_ns[seg_idx], side="left")
+    hi = np.searchsorted(rec_ts, end_ns[seg_idx], side="right")
+    counts = np.maximum(hi - lo, 0)
+    if counts.sum() == 0:
+        return result
+
+    # Coppie (segmento, record) senza cicli: offset progressivi all'interno di ciascun intervallo.
+    pair_seg = np.repeat(seg_idx, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    pair_rec = np.repeat(lo, counts) + offsets
+
+    pairs = pd.DataFrame({
+        "seg": pair_seg,
+        "mode": rec_mode[pair_rec],
+        "confidence": rec_conf[pair_rec],
+    })
+    max_speed = pairs["mode"].map(MAX_SPEED_KMH).to_numpy()
+    pairs = pairs[(speed[pair_seg] <= max_speed) & (pairs["mode"].to_numpy() != original[pair_seg])]
+    if pairs.empty:
+        return result
+
+    scores = pairs.groupby(["seg", "mode"], sort=False)["confidence"].sum().reset_index()
+    best = scores.loc[scores.groupby("seg")["confidence"].idxmax()]
+    result[best["seg"].to_numpy()] = best["mode"].to_numpy()
+    return result
+
+
+def _utc_offset_minutes(timestamp):
+    """
+    Offset dichiarato in coda a un timestamp ISO 8601 ("+02:00" o "+0200"); 0 per "Z" o se assente.
+    """
+    tail = timestamp[-6:].replace(":", "")[-5:]
+    if len(tail) == 5 and tail[0] in "+-" and tail[1:].isdigit():
+        minutes = int(tail[1:3]) * 60 + int(tail[3:])
+        return -minutes if tail[0] == "-" else minutes
+    return 0
+
+
+def _as_utc_ns(value):
+    return pd.Timestamp(value).tz_convert("UTC").tz_localize(None).to_datetime64()
+
+
+def validate_segments(entries, start_date, end_date, raw_signals=None):
+    """
+    Calcola in un'unica operazione vettoriale la velocità implicita di ogni segmento di attività
+    e la confronta con MAX_SPEED_KMH. I segmenti non plausibili vengono riassegnati alla
+    modalità suggerita dai probableActivities dei rawSignals, se presenti, altrimenti segnalati.
+    I segmenti senza endTime o con durata nulla mantengono la modalità originale come non verificati;
+    quelli di modalità non considerate (es. "flying") sono marcati come non tracciati.
+
+    Restituisce un DataFrame indicizzato per posizione in `entries` con le colonne
+    original_type, activity_type (vuoto se segnalato), distance_km, speed_kmh, status
+    e local_start (inizio del segmento nel fuso orario dichiarato dal timestamp).
+    """
+    positions, types, max_speeds, starts, ends, offsets, distances = [], [], [], [], [], [], []
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict) or "startTime" not in entry:
+            continue
+        activity = entry.get("activity")
+        if not activity or "topCandidate" not in activity:
+            continue
+        activity_type = normalize_type(activity["topCandidate"].get("type", ""))
+        positions.append(i)
+        types.append(activity_type)
+        max_speeds.append(MAX_SPEED_KMH.get(activity_type, np.nan))
+        starts.append(entry["startTime"])
+        ends.append(entry.get("endTime"))
+        offsets.append(_utc_offset_minutes(str(entry["startTime"])))
+        distances.append(activity.get("distanceMeters", 0))
+
+    # Inizio e fine in un'unica conversione, come datetime64 UTC.
+    n = len(positions)
+    times = _parse_times(starts + ends).dt.tz_localize(None).to_numpy()
+    start, end = times[:n], times[n:]
+    in_window = (start >= _as_utc_ns(start_date)) & (start <= _as_utc_ns(end_date))
+
+    positions = np.asarray(positions, dtype="int64")[in_window]
+    original = np.asarray(types, dtype=object)[in_window]
+    max_speed = np.asarray(max_speeds, dtype=float)[in_window]
+    start, end = start[in_window], end[in_window]
+    distance_km = pd.to_numeric(pd.Series(distances, dtype=object), errors="coerce").fillna(0).to_numpy()[in_window] / 1000
+    offsets = np.asarray(offsets, dtype="int64")[in_window]
+
+    duration_h = (end - start) / np.timedelta64(1, "h")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed = np.where(duration_h > 0, distance_km / duration_h, np.nan)
+
+    tracked = ~np.isnan(max_speed)
+    # Senza una durata valida la velocità non è calcolabile: il segmento resta non verificato.
+    unverified = tracked & np.isnan(speed)
+    suspect = speed > max_speed
+
+    reassigned = _reassign(start.astype("int64"), end.astype("int64"), speed, original, suspect, raw_signals)
+    activity_type = np.where(suspect, reassigned, original)
+    status = np.select(
+        [~tracked, unverified, ~suspect, pd.notna(reassigned)],
+        ["untracked", "unverified", "ok", "reassigned"],
+        default="flagged",
+    )
+
+    return pd.DataFrame({
+        "original_type": original,
+        "activity_type": activity_type,
+        "distance_km": distance_km,
+        "speed_kmh": speed,
+        "status": status,
+        "local_start": start + offsets * np.timedelta64(1, "m"),
+    }, index=pd.Index(positions, dtype="int64"))
+
+
+def summarize_quality(segments):
+    """
+    Riepilogo per utente dell'esito della validazione (esclusi i segmenti non tracciati).
+    """
+    status = segments["status"].to_numpy()
+    distance_km = segments["distance_km"].to_numpy()
+    tracked = status != "untracked"
+    counts = {s: int((status == s).sum()) for s in ("ok", "reassigned", "flagged", "unverified")}
+    km = {s: float(distance_km[status == s].sum()) for s in ("reassigned", "flagged", "unverified")}
+    km_total = float(distance_km[tracked].sum())
+    return {
+        "segments": int(tracked.sum()),
+        **counts,
+        "km_total": round(km_total, 3),
+        "km_reassigned": round(km["reassigned"], 3),
+        "km_flagged": round(km["flagged"], 3),
+        "km_unverified": round(km["unverified"], 3),
+        "percent_flagged": round(km["flagged"] / km_total * 100, 2) if km_total > 0 else 0,
+    }
+
+
+def save_quality_csv(quality_rows, output_path):
+    with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=QUALITY_FIELDNAMES)
+        writer.writeheader()
+        for row in quality_rows:
+            writer.writerow(row)
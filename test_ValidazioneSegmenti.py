@@ -0,0 +1,106 @@
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from ValidazioneSegmenti import validate_segments, summarize_quality
+
+START_DATE = datetime(2025, 4, 1, tzinfo=timezone.utc)
+END_DATE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def segment(activity_type, start, end, distance_m):
+    return {
+        "startTime": start,
+        "endTime": end,
+        "activity": {"topCandidate": {"type": activity_type}, "distanceMeters": distance_m},
+    }
+
+
+def record(timestamp, *candidates):
+    return {"activityRecord": {
+        "timestamp": timestamp,
+        "probableActivities": [{"type": t, "confidence": c} for t, c in candidates],
+    }}
+
+
+def test_slow_running_is_plausible():
+    entries = [segment("running", "2025-05-01T10:00:00+02:00", "2025-05-01T11:30:00+02:00", 2500)]
+
+    result = validate_segments(entries, START_DATE, END_DATE)
+
+    assert result.loc[0, "status"] == "ok"
+    assert result.loc[0, "activity_type"] == "running"
+
+
+def test_fast_walking_without_candidates_is_flagged():
+    entries = [segment("walking", "2025-05-01T10:00:00+02:00", "2025-05-01T18:40:00+02:00", 100100)]
+
+    result = validate_segments(entries, START_DATE, END_DATE)
+
+    assert result.loc[0, "status"] == "flagged"
+    assert pd.isna(result.loc[0, "activity_type"])
+
+
+def test_missing_timing_is_unverified():
+    entries = [
+        {"startTime": "2025-05-01T10:00:00+02:00",
+         "activity": {"topCandidate": {"type": "cycling"}, "distanceMeters": 5000}},
+        segment("in bus", "2025-05-01T11:00:00+02:00", "2025-05-01T11:00:00+02:00", 3000),
+    ]
+
+    result = validate_segments(entries, START_DATE, END_DATE)
+    quality = summarize_quality(result)
+
+    assert list(result["status"]) == ["unverified", "unverified"]
+    assert list(result["activity_type"]) == ["cycling", "in bus"]
+    assert quality["unverified"] == 2
+    assert quality["km_unverified"] == 8.0
+    assert quality["flagged"] == 0
+
+
+def test_candidates_are_matched_to_their_own_segment():
+    entries = [
+        segment("walking", "2025-05-01T10:00:00+02:00", "2025-05-01T10:30:00+02:00", 20000),
+        {"startTime": "2025-05-01T10:30:00+02:00", "endTime": "2025-05-01T11:00:00+02:00", "visit": {}},
+        segment("walking", "2025-05-01T11:00:00+02:00", "2025-05-01T11:30:00+02:00", 20000),
+        segment("walking", "2025-05-01T12:00:00+02:00", "2025-05-01T12:30:00+02:00", 2000),
+        segment("cycling", "2025-05-01T13:00:00+02:00", "2025-05-01T13:30:00+02:00", 40000),
+        {"startTime": "2025-05-01T14:00:00+02:00",
+         "activity": {"topCandidate": {"type": "walking"}, "distanceMeters": 1000}},
+    ]
+    # Record non ordinati, alcuni tra un segmento e l'altro o dentro segmenti plausibili.
+    raw = [
+        record("2025-05-01T14:00:00+02:00", ("ON_BICYCLE", 1.0)),
+        record("2025-05-01T13:20:00+02:00", ("IN_BUS", 0.35), ("IN_PASSENGER_VEHICLE", 0.45)),
+        record("2025-05-01T13:30:00+02:00", ("IN_PASSENGER_VEHICLE", 0.45)),
+        record("2025-05-01T12:10:00+02:00", ("ON_BICYCLE", 1.0)),
+        record("2025-05-01T10:10:00+02:00", ("ON_BICYCLE", 0.7), ("WALKING", 0.9)),
+        record("2025-05-01T13:05:00+02:00", ("IN_BUS", 0.5)),
+        record("2025-05-01T11:10:00+02:00", ("IN_ROAD_VEHICLE", 0.8), ("WALKING", 0.2)),
+        record("2025-05-01T10:45:00+02:00", ("IN_PASSENGER_VEHICLE", 1.0)),
+    ]
+
+    result = validate_segments(entries, START_DATE, END_DATE, raw)
+
+    assert list(result.index) == [0, 2, 3, 4, 5]
+    assert list(result["status"]) == ["reassigned", "flagged", "ok", "reassigned", "unverified"]
+    assert result.loc[0, "activity_type"] == "cycling"
+    assert result.loc[3, "activity_type"] == "walking"
+    # Le confidenze si sommano sui record del segmento, estremi inclusi: 0.45 + 0.45 batte 0.5 + 0.35.
+    assert result.loc[4, "activity_type"] == "in passenger vehicle"
+    # Senza endTime la velocità non è calcolabile: nessun candidato, modalità originale mantenuta.
+    assert pd.isna(result.loc[5, "speed_kmh"])
+    assert result.loc[5, "activity_type"] == "walking"
+
+
+def test_local_start_keeps_declared_offset():
+    entries = [
+        segment("walking", "2025-05-01T00:30:00+02:00", "2025-05-01T00:50:00+02:00", 1000),
+        segment("flying", "2025-05-01T23:30:00-03:00", "2025-05-02T02:30:00-03:00", 900000),
+    ]
+
+    result = validate_segments(entries, START_DATE, END_DATE)
+
+    assert list(result["local_start"].dt.strftime("%Y-%m-%d %H:%M")) == ["2025-05-01 00:30", "2025-05-01 23:30"]
+    assert list(result["status"]) == ["ok", "untracked"]
+    assert summarize_quality(result)["segments"] == 1